@@ -1,7 +1,14 @@
 import asyncio
-import debugpy
+import os
 from flask import Flask, request, jsonify
 
+try:
+    import uvloop
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
 from forta_agent import TransactionEvent
 
 from src.hydra.database_controllers.db_controller import initialize_database
@@ -18,6 +25,12 @@ from src.hydra.utils import globals
 from src.constants import N, B_SIZE
 from src.hydra.utils.utils import update_transaction_counter
 
+# attach a debugger on port 5678 only when explicitly requested
+if os.environ.get("SYBIL_DEBUG"):
+    import debugpy
+
+    debugpy.listen(5678)
+
 app = Flask(__name__)
 
 
@@ -26,6 +39,10 @@ app = Flask(__name__)
 DATABASE_TYPE = "local"
 transaction_b = []
 
+# a single loop is reused for every transaction instead of looking it up per call
+event_loop = asyncio.new_event_loop()
+asyncio.set_event_loop(event_loop)
+
 
 @app.route("/transaction", methods=["POST"])
 def transaction():
@@ -42,19 +59,18 @@ if __name__ == "__main__":
 # forta sdk doesn't recognize "async handle_transaction" so it needs to be wrapped to make it async
 def handle_transaction(transaction_event: TransactionEvent):
     print("running handle transaction")
-    loop = asyncio.get_event_loop()
+    return event_loop.run_until_complete(handle_transaction_entry(transaction_event))
+
+
+# single coroutine per transaction so the loop is entered once
+async def handle_transaction_entry(transaction_event: TransactionEvent):
     network_name = transaction_event.network.name
 
     # neo4j-kafka is expected to be initialized outside of the agent
-    if DATABASE_TYPE != "neo4jkafka":
-        if not loop.is_running():
-            loop.run_until_complete(initialize_database(network_name))
-        else:
-            loop.create_task(initialize_database(network_name))
+    if DATABASE_TYPE != "neo4jkafka" and not globals.database_initialized:
+        await initialize_database(network_name)
 
-    return loop.run_until_complete(
-        handle_transaction_async(transaction_event, network_name)
-    )
+    return await handle_transaction_async(transaction_event, network_name)
 
 
 async def handle_transaction_async(
@@ -77,29 +93,40 @@ async def handle_transaction_async(
     else:
         transaction_b.append(transaction_event)
         print("batch size is:", len(transaction_b))
-        if len(transaction_b) >= B_SIZE:
-            if DATABASE_TYPE == "local":
-                async with get_async_session(network_name) as session:
-                    try:
-                        await add_transactions_b_to_db(session, transaction_b)
-                        print(f"{B_SIZE} transactions committed to the local database")
-                    except Exception as e:
-                        print(f"An error occurred in local DB: {e}")
-
-            transaction_b.clear()
 
     update_transaction_counter()
 
     print("transaction counter is", globals.transaction_counter)
     print("current block is...", transaction_event.block_number)
-    if globals.transaction_counter >= N:
-
-        if DATABASE_TYPE == "local":
-            print("processing transactions")
-            findings.extend(await process_transactions(network_name))
-            await remove_processed_transfers(network_name)
-            await remove_processed_contract_transactions(network_name)
 
+    flush_batch = len(transaction_b) >= B_SIZE
+    process_batch = globals.transaction_counter >= N
+
+    # one session is shared by the batch insert, processing and cleanup, but
+    # it commits more than once: mark_batch_processed commits the inserted
+    # rows together with their processed flags, and leaving the context
+    # manager commits the deletes (or the insert alone when nothing is
+    # processed)
+    if DATABASE_TYPE == "local" and (flush_batch or process_batch):
+        async with get_async_session(network_name) as session:
+            if flush_batch:
+                try:
+                    await add_transactions_b_to_db(session, transaction_b)
+                    print(f"{B_SIZE} transactions added to the local database")
+                except Exception as e:
+                    print(f"An error occurred in local DB: {e}")
+                    await session.rollback()
+
+            if process_batch:
+                print("processing transactions")
+                findings.extend(await process_transactions(session, network_name))
+                await remove_processed_transfers(session)
+                await remove_processed_contract_transactions(session)
+
+    if flush_batch:
+        transaction_b.clear()
+
+    if process_batch:
         globals.transaction_counter = 0
         print("ALL COMPLETE")
         return findings
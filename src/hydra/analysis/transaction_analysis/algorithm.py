@@ -1,20 +1,56 @@
-import community as community_louvain
-import networkx as nx
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import igraph as ig
 from src.constants import C_SIZE, L_THRESHOLD
 
+# created on first use and kept for the life of the agent, so worker start-up
+# isn't paid on every batch. forkserver workers aren't forked from the
+# threaded agent process itself
+process_pool = None
 
-def run_algorithm(G2):
-    sccs = [
-        G2.subgraph(c).copy()
-        for c in nx.strongly_connected_components(G2)
-        if len(c) > C_SIZE
-    ]
-    wccs = [
-        G2.subgraph(c).copy()
-        for c in nx.weakly_connected_components(G2)
-        if len(c) > C_SIZE
+
+def to_igraph(G2):
+    # only the structure and edge weights are needed for partitioning, so the
+    # batch networkx graph is copied into igraph without its other attributes
+    node_index = {node: index for index, node in enumerate(G2.nodes())}
+    edges = []
+    weights = []
+    for u, v, data in G2.edges(data=True):
+        edges.append((node_index[u], node_index[v]))
+        weights.append(data.get("weight", 1))
+
+    return ig.Graph(
+        n=len(node_index),
+        edges=edges,
+        directed=True,
+        vertex_attrs={"name": list(node_index)},
+        edge_attrs={"weight": weights},
+    )
+
+
+def run_louvain(graph, component):
+    undirected_component = graph.induced_subgraph(component)
+    undirected_component.to_undirected(mode="collapse", combine_edges="first")
+    clustering = undirected_component.community_multilevel(weights="weight")
+    return [
+        [undirected_component.vs[vertex]["name"] for vertex in sub_community]
+        for sub_community in clustering
     ]
 
+
+def run_algorithm(G2):
+    return partition_graph(to_igraph(G2))
+
+
+def partition_graph(graph):
+    names = graph.vs["name"]
+
+    # components are kept as vertex index lists; a subgraph is only built for
+    # the large components that go through Louvain
+    sccs = [c for c in graph.connected_components(mode="strong") if len(c) > C_SIZE]
+    wccs = [c for c in graph.connected_components(mode="weak") if len(c) > C_SIZE]
+
     print(f"Initial SCCs: {len(sccs)}")
     print(f"Initial WCCs: {len(wccs)}")
 
@@ -24,45 +60,98 @@ def run_algorithm(G2):
     for idx, component in enumerate(sccs, start=1):
         print(f"Processing SCC_{idx} with {len(component)} nodes.")
         if len(component) <= L_THRESHOLD:
-            for node in component:
+            for vertex in component:
+                node = names[vertex]
                 communities[node] = community_index
                 print(f"Assigned community {community_index} to Node {node}.")
             community_index += 1  # Increment community_index after assigning it to all nodes in the component
         else:
             print(f"Running Louvain on large SCC (size: {len(component)})")
-            undirected_component = component.to_undirected()
-            partition = community_louvain.best_partition(undirected_component)
+            partition = run_louvain(graph, component)
             print(f"Generated partitions using Louvain on large SCC: {partition}")
 
-            unique_sub_communities = set(partition.values())
-            for sub_community in unique_sub_communities:
-                for node, community in partition.items():
-                    if community == sub_community:
-                        communities[node] = community_index
-                        print(f"Assigning {node} to community {community_index}")
+            for sub_community in partition:
+                for node in sub_community:
+                    communities[node] = community_index
+                    print(f"Assigning {node} to community {community_index}")
                 community_index += 1
 
     for idx, component in enumerate(wccs, start=1):
         print(f"Processing WCC_{idx} with {len(component)} nodes.")
         if len(component) <= L_THRESHOLD:
-            for node in component:
+            for vertex in component:
+                node = names[vertex]
                 if node not in communities:  # Prevent overwriting SCC communities
                     communities[node] = community_index
                     print(f"Assigned community {community_index} to Node {node}.")
             community_index += 1  # Increment community_index after assigning it to all nodes in the component
         else:
             print(f"Running Louvain on large WCC (size: {len(component)})")
-            undirected_component = component.to_undirected()
-            partition = community_louvain.best_partition(undirected_component)
+            partition = run_louvain(graph, component)
             print(f"Generated partitions using Louvain on large WCC: {partition}")
 
-            unique_sub_communities = set(partition.values())
-            for sub_community in unique_sub_communities:
-                for node, community in partition.items():
-                    if community == sub_community and node not in communities:
+            for sub_community in partition:
+                for node in sub_community:
+                    if node not in communities:
                         communities[node] = community_index
                         print(f"Assigning {node} to community {community_index}")
                 community_index += 1
 
     print(f"Total Communities Assigned: {len(set(communities.values()))}")
     return communities
+
+
+def get_process_pool():
+    global process_pool
+    if process_pool is None:
+        process_pool = ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+    return process_pool
+
+
+async def run_algorithm_in_parallel(G2):
+    # communities never span weakly connected components, so the components
+    # that go through Louvain are partitioned in their own processes. The
+    # rest only need a labelling pass, which is cheaper than the round trip
+    # to a worker, so they are labelled here while the workers run
+    graph = to_igraph(G2)
+    louvain_components = [
+        c for c in graph.connected_components(mode="weak") if len(c) > L_THRESHOLD
+    ]
+    if len(louvain_components) <= 1:
+        # nothing to spread out, so skip the round trip to a worker
+        return partition_graph(graph)
+    print(f"Partitioning {len(louvain_components)} large WCCs in parallel")
+
+    loop = asyncio.get_running_loop()
+    executor = get_process_pool()
+    louvain_partitions = asyncio.gather(
+        *[
+            loop.run_in_executor(
+                executor, partition_graph, graph.induced_subgraph(component)
+            )
+            for component in louvain_components
+        ]
+    )
+    louvain_vertices = set().union(*louvain_components)
+    partitions = [
+        partition_graph(
+            graph.induced_subgraph(
+                [v for v in range(graph.vcount()) if v not in louvain_vertices]
+            )
+        )
+    ]
+    partitions.extend(await louvain_partitions)
+
+    # every component numbers its communities from 1, so shift them to keep
+    # the ids unique across the batch
+    communities = {}
+    community_offset = 0
+    for partition in partitions:
+        for node, community in partition.items():
+            communities[node] = community + community_offset
+        community_offset += max(partition.values(), default=0)
+
+    print(f"Total Communities Assigned: {len(set(communities.values()))}")
+    return communities
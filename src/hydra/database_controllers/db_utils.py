@@ -1,7 +1,7 @@
 from src.hydra.database_controllers.models import Transfer, ContractTransaction
+from sqlalchemy import delete, insert
 from sqlalchemy.future import select
 
-from src.hydra.database_controllers.db_controller import get_async_session
 
 from src.hydra.database_controllers.models import (
     Transfer,
@@ -92,96 +92,114 @@ from src.hydra.database_controllers.models import (
 #                 )
 
 
+# SQLite caps the number of bound parameters per statement, so tx_hash lookups
+# are issued in chunks of this size
+TX_HASH_LOOKUP_CHUNK = 500
+
+
+async def get_existing_tx_hashes(session, tx_hashes):
+    existing_tx_hashes = set()
+    for i in range(0, len(tx_hashes), TX_HASH_LOOKUP_CHUNK):
+        chunk = tx_hashes[i : i + TX_HASH_LOOKUP_CHUNK]
+        existing_transfers = await session.execute(
+            select(Transfer.tx_hash).where(Transfer.tx_hash.in_(chunk))
+        )
+        existing_contract_txs = await session.execute(
+            select(ContractTransaction.tx_hash).where(
+                ContractTransaction.tx_hash.in_(chunk)
+            )
+        )
+        existing_tx_hashes.update(existing_transfers.scalars())
+        existing_tx_hashes.update(existing_contract_txs.scalars())
+    return existing_tx_hashes
+
+
 async def add_transactions_b_to_db(session, transaction_events):
+    # Check which transactions already exist in the database in one pass
+    existing_tx_hashes = await get_existing_tx_hashes(
+        session, [transaction_event.hash for transaction_event in transaction_events]
+    )
+
+    transfers = []
+    contract_transactions = []
     for transaction_event in transaction_events:
-        sender = transaction_event.from_
-        receiver = transaction_event.to
         tx_hash = transaction_event.hash
-        amount = transaction_event.transaction.value
-        gas_price = transaction_event.gas_price
-        timestamp = transaction_event.timestamp
-        data = transaction_event.transaction.data
-        chainId = str(transaction_event.network.name)
-
-        # Check if the transaction already exists in the database
-        existing_transfer = await session.execute(
-            select(Transfer).where(Transfer.tx_hash == tx_hash)
-        )
-        existing_contract_tx = await session.execute(
-            select(ContractTransaction).where(ContractTransaction.tx_hash == tx_hash)
-        )
 
         # If a record with the same tx_hash exists, skip insertion
-        if (
-            existing_transfer.scalar_one_or_none()
-            or existing_contract_tx.scalar_one_or_none()
-        ):
+        if tx_hash in existing_tx_hashes:
             print(
                 f"Transaction with hash {tx_hash} already exists in the database. Skipping..."
             )
             continue
 
         try:
+            sender = transaction_event.from_
+            receiver = transaction_event.to
+            amount = transaction_event.transaction.value
+            gas_price = transaction_event.gas_price
+            timestamp = transaction_event.timestamp
+            data = transaction_event.transaction.data
+            chainId = str(transaction_event.network.name)
+
             if data != "0x":
-                session.add(
-                    ContractTransaction(
-                        tx_hash=tx_hash,
-                        sender=sender,
-                        contract_address=receiver,
-                        amount=amount,
-                        timestamp=timestamp,
-                        data=data,
-                        chainId=chainId,
-                    )
+                contract_transactions.append(
+                    {
+                        "tx_hash": tx_hash,
+                        "sender": sender,
+                        "contract_address": receiver,
+                        "amount": amount,
+                        "timestamp": timestamp,
+                        "data": data,
+                        "chainId": chainId,
+                        "processed": False,
+                    }
                 )
-                print(f"Added ContractTransaction {tx_hash} to the database")
             else:
-                session.add(
-                    Transfer(
-                        tx_hash=tx_hash,
-                        sender=sender,
-                        receiver=receiver,
-                        amount=amount,
-                        gas_price=gas_price,
-                        timestamp=timestamp,
-                        chainId=chainId,
-                        processed=False,
-                    )
+                transfers.append(
+                    {
+                        "tx_hash": tx_hash,
+                        "sender": sender,
+                        "receiver": receiver,
+                        "amount": amount,
+                        "gas_price": gas_price,
+                        "timestamp": timestamp,
+                        "chainId": chainId,
+                        "processed": False,
+                    }
                 )
-                print(f"Added Transfer {tx_hash} to the database")
+            existing_tx_hashes.add(tx_hash)
 
         except Exception as e:
             print(
                 f"Error occurred while adding transaction {tx_hash}: {e}. Skipping this transaction."
             )
 
-
-async def remove_processed_transfers(network_name):
-    async with get_async_session(network_name) as session:
-        # Select all transfers where processed is True
-        processed_txs = await session.execute(
-            select(Transfer).where(Transfer.processed == True)
-        )
-        processed_txs = processed_txs.scalars().all()
-
-        for tx in processed_txs:
-            await session.delete(tx)
-
-        await session.commit()
-
-
-async def remove_processed_contract_transactions(network_name):
-    async with get_async_session(network_name) as session:
-        # Select all contract transactions where processed is True
-        processed_ctxs = await session.execute(
-            select(ContractTransaction).where(ContractTransaction.processed == True)
-        )
-        processed_ctxs = processed_ctxs.scalars().all()
-
-        for ctx in processed_ctxs:
-            await session.delete(ctx)
-
-        await session.commit()
+    # Bulk insert the whole batch instead of flushing one ORM object per row
+    if transfers:
+        await session.execute(insert(Transfer), transfers)
+    if contract_transactions:
+        await session.execute(insert(ContractTransaction), contract_transactions)
+    print(
+        f"Added {len(transfers)} Transfers and {len(contract_transactions)} ContractTransactions to the database"
+    )
+
+
+async def remove_processed_transfers(session):
+    # Delete all transfers where processed is True in a single statement
+    await session.execute(
+        delete(Transfer)
+        .where(Transfer.processed == True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def remove_processed_contract_transactions(session):
+    # Delete all contract transactions where processed is True in a single statement
+    await session.execute(
+        delete(ContractTransaction)
+        .where(ContractTransaction.processed == True)
+        .execution_options(synchronize_session=False)
+    )
 
 
 def extract_method_id(data):
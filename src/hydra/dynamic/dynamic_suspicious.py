@@ -1,5 +1,6 @@
 import networkx as nx
 import logging
+import orjson
 
 
 def merge_final_graphs_neo4j(driver, G_analyzed, network_name):
@@ -39,6 +40,22 @@ def merge_final_graphs_neo4j(driver, G_analyzed, network_name):
             )
 
 
+def normalize_graph_attributes(data):
+    # GraphML can't store lists or types, so they are serialized as they are
+    # merged into the persistent graph
+    # copy the dict in one go and only rewrite the (rare) list and type values
+    normalized = dict(data)
+    for key, value in data.items():
+        value_type = type(value)
+        if value_type is str:
+            continue
+        if value_type is list:
+            normalized[key] = orjson.dumps(value).decode()
+        elif value_type is type:
+            normalized[key] = str(value)
+    return normalized
+
+
 def merge_final_graphs(G_analyzed, persistent_graph):
     print("Starting merge of final graphs...")
 
@@ -100,8 +117,13 @@ def merge_final_graphs(G_analyzed, persistent_graph):
                 ).append(node)
 
                 if G_analyzed_community != target_community:
+                    # match on the original ids so a community that was already
+                    # relabelled isn't picked up again by a later remap
                     for n, d in G_analyzed.nodes(data=True):
-                        if d["community"] == G_analyzed_community:
+                        if (
+                            original_G_analyzed_communities.get(n)
+                            == G_analyzed_community
+                        ):
                             d["community"] = target_community
                             print(
                                 f"Updating node {n} from community {G_analyzed_community} to {target_community}."
@@ -137,8 +159,14 @@ def merge_final_graphs(G_analyzed, persistent_graph):
 
                 new_community_id += 1
 
-        persistent_graph.add_nodes_from(G_analyzed.nodes(data=True))
-        persistent_graph.add_edges_from(G_analyzed.edges(data=True))
+        persistent_graph.add_nodes_from(
+            (node, normalize_graph_attributes(data))
+            for node, data in G_analyzed.nodes(data=True)
+        )
+        persistent_graph.add_edges_from(
+            (u, v, normalize_graph_attributes(data))
+            for u, v, data in G_analyzed.edges(data=True)
+        )
 
         print("Completed merge of final graphs.")
 
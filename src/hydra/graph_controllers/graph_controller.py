@@ -1,6 +1,6 @@
 from src.constants import C_SIZE
 from collections import defaultdict
-import decimal
+import numpy as np
 from src.hydra.database_controllers.db_controller import get_async_session
 from sqlalchemy.future import select
 from src.hydra.database_controllers.models import Transfer
@@ -15,105 +15,161 @@ from src.hydra.database_controllers.models import Transfer
 #         convert_decimal_to_float()
 
 
-def add_transactions_to_graph(transfers, subgraph):
-    added_edges = []
-    for transfer in transfers:
-        if transfer.sender is not None and transfer.receiver is not None:
-            # Add sender and receiver nodes with chainId attribute
-            subgraph.add_node(
-                transfer.sender, chainId=transfer.chainId, address=transfer.sender
-            )
-            subgraph.add_node(
-                transfer.receiver, chainId=transfer.chainId, address=transfer.receiver
-            )
+# columns pulled for graph construction, in the order add_transactions_to_graph unpacks
+TRANSFER_BATCH_COLUMNS = (
+    Transfer.tx_hash,
+    Transfer.sender,
+    Transfer.receiver,
+    Transfer.amount,
+    Transfer.gas_price,
+    Transfer.timestamp,
+    Transfer.chainId,
+)
 
-            # Add edge with attributes
-            subgraph.add_edge(
-                transfer.sender,
-                transfer.receiver,
-                hash=transfer.tx_hash,
-                timestamp=transfer.timestamp,
-                gas_price=transfer.gas_price,
-                amount=transfer.amount,
-                chainId=transfer.chainId,
-            )
-            added_edges.append((transfer.sender, transfer.receiver))
-        else:
-            print(
-                f"Skipping edge addition for transfer with sender={transfer.sender} and receiver={transfer.receiver}"
-            )
+
+async def add_transactions_to_graph(transfer_partitions, subgraph):
+    added_edges = []
+    async for rows in transfer_partitions:
+        for tx_hash, sender, receiver, amount, gas_price, timestamp, chainId in rows:
+            if sender is not None and receiver is not None:
+                # Add sender and receiver nodes with chainId attribute
+                subgraph.add_node(sender, chainId=chainId, address=sender)
+                subgraph.add_node(receiver, chainId=chainId, address=receiver)
+
+                # Add edge with attributes
+                subgraph.add_edge(
+                    sender,
+                    receiver,
+                    hash=tx_hash,
+                    timestamp=timestamp,
+                    gas_price=float(gas_price),
+                    amount=float(amount),
+                    chainId=chainId,
+                )
+                added_edges.append((sender, receiver))
+            else:
+                print(
+                    f"Skipping edge addition for transfer with sender={sender} and receiver={receiver}"
+                )
     return subgraph, added_edges
 
 
-def adjust_edge_weights_and_variances(transfers, subgraph):
+def segmented_cumsum(values, local_index):
+    # Inclusive prefix sums that restart at every group, where local_index is
+    # each element's position inside its (contiguous) group. Doubling steps
+    # keep every sum local to its own group, so a wei-scale group earlier in
+    # the array can't swamp the rounding of a small one after it.
+    sums = values.copy()
+    step = 1
+    max_index = local_index.max(initial=0)
+    while step <= max_index:
+        shifted = np.zeros_like(sums)
+        shifted[step:] = sums[:-step]
+        sums += np.where(local_index >= step, shifted, 0.0)
+        step *= 2
+    return sums
+
+
+def mean_absolute_differences(values, sources, targets, node_count):
+    # For every edge (u, v), the mean of |value(u, v) - value(v, w)| over the
+    # out-edges (v, w) of its target, or 0 when v has no out-edges.
+    #
+    # The out-edges of every node are sorted by value. For an edge pointing at
+    # v, the number of v's values below it and their sum (and likewise above
+    # it) are enough to add up the absolute differences without pairing edges
+    # up. Values are shifted by the smallest out-edge value of their group
+    # first, so identical values cancel exactly.
+    edge_count = len(values)
+    group_counts = np.bincount(sources, minlength=node_count)
+    counts_before = np.cumsum(group_counts) - group_counts
+
+    reference_order = np.lexsort((values, sources))
+    reference_groups = sources[reference_order]
+    local_index = np.arange(edge_count) - counts_before[reference_groups]
+
+    shifts = np.zeros(node_count)
+    group_starts = local_index == 0
+    shifts[reference_groups[group_starts]] = values[reference_order][group_starts]
+    references = values[reference_order] - shifts[reference_groups]
+    queries = values - shifts[targets]
+
+    prefix_sums = segmented_cumsum(references, local_index)
+    reverse_index = group_counts[reference_groups] - 1 - local_index
+    suffix_sums = segmented_cumsum(references[::-1], reverse_index[::-1])[::-1]
+
+    # Each edge is entered twice into one sorted sequence: once as a reference
+    # in its source's group and once as a query in its target's group, so the
+    # references counted before a query are the ones at or below it
+    groups = np.concatenate((reference_groups, targets))
+    keys = np.concatenate((references, queries))
+    is_query = np.concatenate(
+        (np.zeros(edge_count, dtype=bool), np.ones(edge_count, dtype=bool))
+    )
+    order = np.lexsort((is_query, keys, groups))
+    running_counts = np.cumsum(~is_query[order])
+    positions = np.empty(2 * edge_count, dtype=np.int64)
+    positions[order] = np.arange(2 * edge_count)
+
+    totals = group_counts[targets]
+    below_counts = running_counts[positions[edge_count:]] - counts_before[targets]
+    above_counts = totals - below_counts
+    last_below = counts_before[targets] + below_counts - 1
+    first_above = counts_before[targets] + below_counts
+    below_sums = np.where(
+        below_counts > 0, prefix_sums[np.clip(last_below, 0, edge_count - 1)], 0.0
+    )
+    above_sums = np.where(
+        above_counts > 0, suffix_sums[np.clip(first_above, 0, edge_count - 1)], 0.0
+    )
+
+    # both halves are sums of non-negative differences, so clamp away rounding
+    absolute_sums = np.maximum(queries * below_counts - below_sums, 0.0) + np.maximum(
+        above_sums - queries * above_counts, 0.0
+    )
+    return np.divide(
+        absolute_sums,
+        totals,
+        out=np.zeros(edge_count),
+        where=totals > 0,
+    )
+
+
+def adjust_edge_weights_and_variances(added_edges, subgraph):
     # TODO: CHeck loGIC??
     # TODO: Update edge weights based on variance
     # TODO: place edge weight logic in heuristic module
     edge_weights = defaultdict(int)
-    for transfer in transfers:
-        edge = (transfer.sender, transfer.receiver)
+    for edge in added_edges:
         edge_weights[edge] += 1
 
-    processed_edges = set()
-    for node in subgraph.nodes():
-        for primary_edge in subgraph.edges(node, data=True):
-            if (node, primary_edge[1]) in processed_edges or (
-                primary_edge[1],
-                node,
-            ) in processed_edges:
-                continue
-
-            target = primary_edge[1]
-            variances = []
-
-            for adj_edge in subgraph.edges(target, data=True):
-
-                gas_price_var = abs(
-                    float(primary_edge[2]["gas_price"])
-                    - float(adj_edge[2]["gas_price"])
-                )
-                amount_var = abs(
-                    float(primary_edge[2]["amount"]) - float(adj_edge[2]["amount"])
-                )
-
-                timestamp_var = abs(
-                    primary_edge[2]["timestamp"] - adj_edge[2]["timestamp"]
-                )
-
-                variances.append(
-                    gas_price_var + float(amount_var) + float(timestamp_var)
-                )
-
-            # Take mean variance for primary edge
-            mean_variance = sum(variances) / len(variances) if variances else 0
-
-            # Adjust the weight
-            initial_weight = edge_weights[(node, target)]
-
-            adjusted_weight = (1 / (mean_variance + 1)) * initial_weight
-
-            # Update the edge in the graph
-            subgraph.add_edge(node, target, weight=adjusted_weight)
-            processed_edges.add((node, target))
-    return subgraph
+    edges = list(subgraph.edges(data=True))
+    if not edges:
+        return subgraph
+
+    node_index = {node: index for index, node in enumerate(subgraph.nodes())}
+    sources = np.array([node_index[u] for u, _, _ in edges], dtype=np.int64)
+    targets = np.array([node_index[v] for _, v, _ in edges], dtype=np.int64)
+
+    # The variance of an edge is the mean over the target's out-edges of the
+    # summed gas price, amount and timestamp differences, so each attribute's
+    # mean absolute difference can be computed separately and added up
+    mean_variances = np.zeros(len(edges))
+    for attribute in ("gas_price", "amount", "timestamp"):
+        values = np.array([data[attribute] for _, _, data in edges], dtype=float)
+        mean_variances += mean_absolute_differences(
+            values, sources, targets, len(node_index)
+        )
 
-    print("edges added to graph")
+    processed_edges = set()
+    for (node, target, data), mean_variance in zip(edges, mean_variances.tolist()):
+        if (node, target) in processed_edges or (target, node) in processed_edges:
+            continue
 
+        # Adjust the weight
+        initial_weight = edge_weights[(node, target)]
 
-def convert_decimal_to_float(subgraph):
-    for node, data in subgraph.nodes(data=True):
-        for key, value in data.items():
-            if isinstance(value, list):
-                print(f"Node {node} has list data: {key} = {value}")
-            if isinstance(value, decimal.Decimal):
-                data[key] = float(value)
-
-    for u, v, data in subgraph.edges(data=True):
-        for key, value in data.items():
-            if isinstance(value, list):
-                print(f"Edge ({u}, {v}) has list data: {key} = {value}")
-            if isinstance(value, decimal.Decimal):
-                data[key] = float(value)
+        data["weight"] = (1 / (mean_variance + 1)) * initial_weight
+        processed_edges.add((node, target))
     return subgraph
 
 
@@ -1,8 +1,8 @@
 from src.hydra.database_controllers.models import Transfer, ContractTransaction
 from src.hydra.graph_controllers.graph_controller import (
+    TRANSFER_BATCH_COLUMNS,
     add_transactions_to_graph,
     adjust_edge_weights_and_variances,
-    convert_decimal_to_float,
     process_partitions,
 )
 
@@ -12,9 +12,11 @@ from src.hydra.dynamic.dynamic_suspicious import (
 )
 from src.hydra.graph_controllers.final_graph_controller import load_graph, save_graph
 
-from src.hydra.analysis.transaction_analysis.algorithm import run_algorithm
+from src.hydra.analysis.transaction_analysis.algorithm import (
+    run_algorithm_in_parallel,
+)
 from src.hydra.database_controllers.clustering import generate_alerts
-from src.hydra.database_controllers.db_controller import get_async_session
+from sqlalchemy import update
 from sqlalchemy.future import select
 from src.hydra.analysis.community_analysis.base_analyzer import (
     analyze_communities,
@@ -346,136 +348,173 @@ async def load_graphml_into_neo4j(driver, network_name):
 #         print("Communities detected and assigned.")
 
 
-async def process_transactions(network_name: str):
-    findings = []
-    print("network name is:", network_name)
-
-    async with get_async_session(network_name) as session:
-        print("pulling all transfers...")
-        # Assume the Transfer model and select function are defined elsewhere
-        transfer_result = await session.execute(
-            select(Transfer).where(
-                (Transfer.processed == False) & (Transfer.chainId == network_name)
-            )
-        )
-        transfers = transfer_result.scalars().all()
-        print("transfers pulled")
-        globals.all_transfers += len(transfers)
-        print("Number of transfers:", globals.all_transfers)
-
-        contract_transaction_result = await session.execute(
-            select(ContractTransaction).where(
-                (ContractTransaction.processed == False)
-                & (ContractTransaction.chainId == network_name)
-            )
+async def mark_batch_processed(session, network_name):
+    # Flip the processed flag with one UPDATE per table instead of
+    # dirtying every loaded ORM instance
+    transfer_update = await session.execute(
+        update(Transfer)
+        .where((Transfer.processed == False) & (Transfer.chainId == network_name))
+        .values(processed=True)
+        .execution_options(synchronize_session=False)
+    )
+    contract_transaction_update = await session.execute(
+        update(ContractTransaction)
+        .where(
+            (ContractTransaction.processed == False)
+            & (ContractTransaction.chainId == network_name)
         )
-        contract_transactions = contract_transaction_result.scalars().all()
-        print("contract transactions pulled")
-        globals.all_contract_transactions += len(contract_transactions)
-        print("Number of contract transactions:", globals.all_contract_transactions)
+        .values(processed=True)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return transfer_update.rowcount, contract_transaction_update.rowcount
+
 
-        for transfer in transfers:
-            transfer.processed = True
-        for transaction in contract_transactions:
-            transaction.processed = True
-        await session.commit()
+async def process_transactions(session, network_name: str):
+    findings = []
+    print("network name is:", network_name)
 
+    print("pulling all transfers...")
+    # Stream Core row tuples of only the needed columns into the graph rather
+    # than materializing an ORM object for every unprocessed row
+    transfer_result = await session.stream(
+        select(*TRANSFER_BATCH_COLUMNS)
+        .where((Transfer.processed == False) & (Transfer.chainId == network_name))
+        .execution_options(yield_per=5000)
+    )
     subgraph = nx.DiGraph()
-    subgraph, added_edges = add_transactions_to_graph(transfers, subgraph)
-    print("added total edges:", len(added_edges))
+    subgraph, added_edges = await add_transactions_to_graph(
+        transfer_result.partitions(), subgraph
+    )
+    print("transfers pulled")
 
-    # globals.global_added_edges.extend(added_edges)
-    # Create a new directed subgraph using only the edges added in the current iteration
+    contract_transaction_result = await session.execute(
+        select(ContractTransaction).where(
+            (ContractTransaction.processed == False)
+            & (ContractTransaction.chainId == network_name)
+        )
+    )
+    contract_transactions = contract_transaction_result.scalars().all()
+    print("contract transactions pulled")
+
+    # Flag the batch as processed in the background so the UPDATE and
+    # commit overlap with the graph analysis below; sleep(0) lets the task
+    # hand the UPDATE to the driver before the CPU-bound work starts
+    mark_processed_task = asyncio.create_task(
+        mark_batch_processed(session, network_name)
+    )
+    await asyncio.sleep(0)
 
-    subgraph = adjust_edge_weights_and_variances(transfers, subgraph)
+    try:
+        print("added total edges:", len(added_edges))
 
-    subgraph = convert_decimal_to_float(subgraph)
-    # nx.write_graphml(globals.G1, "src/graph/graphs/initial_global_graph.graphml")
+        # globals.global_added_edges.extend(added_edges)
+        # Create a new directed subgraph using only the edges added in the current iteration
 
-    print(f"Number of nodes in subgraph: {subgraph.number_of_nodes()}")
-    print(f"Number of edges in subgraph: {subgraph.number_of_edges()}")
+        subgraph = adjust_edge_weights_and_variances(added_edges, subgraph)
 
-    subgraph_partitions = run_algorithm(subgraph)
+        print(f"Number of nodes in subgraph: {subgraph.number_of_nodes()}")
+        print(f"Number of edges in subgraph: {subgraph.number_of_edges()}")
 
-    updated_subgraph = process_partitions(subgraph_partitions, subgraph)
-    nx.write_graphml(
-        updated_subgraph,
-        f"src/g/graphs/updated_{network_name}_subgraph.graphml",
-    )
+        subgraph_partitions = await run_algorithm_in_parallel(subgraph)
 
-    # print("is initial batch?", globals.is_initial_batch)
-    # if not globals.is_initial_batch:
-    #     merge_new_communities(
-    #         updated_subgraph,
-    #     )
-    # else:
-    #     globals.G2 = updated_subgraph.copy()
-
-    print("analyzing clusters for suspicious activity")
-    analyzed_subgraph = (
-        await analyze_communities(updated_subgraph, contract_transactions) or []
-    )
+        updated_subgraph = process_partitions(subgraph_partitions, subgraph)
+        if globals.DEBUG_DUMP_GRAPHS:
+            # written off the event loop, but awaited before analysis mutates
+            # the subgraph
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                nx.write_graphml,
+                updated_subgraph,
+                f"src/g/graphs/updated_{network_name}_subgraph.graphml",
+            )
 
-    try:
-        persisted_graph = load_graph(
-            f"src/g/graphs_two/final_{network_name}_graph.graphml"
-            # f"src/graph/graphs_two/final_graph17.graphml"
+        # print("is initial batch?", globals.is_initial_batch)
+        # if not globals.is_initial_batch:
+        #     merge_new_communities(
+        #         updated_subgraph,
+        #     )
+        # else:
+        #     globals.G2 = updated_subgraph.copy()
+
+        print("analyzing clusters for suspicious activity")
+        analyzed_subgraph = (
+            await analyze_communities(updated_subgraph, contract_transactions) or []
         )
 
-    except Exception as e:
-        persisted_graph = nx.Graph()
-
-    # driver = get_neo4j_driver()
-    # if driver is None:
-    #     print("Failed to get Neo4j driver")
-    #     return
-
-    final_graph, previous_community_ids = merge_final_graphs(
-        analyzed_subgraph, persisted_graph
-    )
-
-    # final_graph, previous_community_ids = merge_final_graphs_neo4j(
-    #     driver, analyzed_subgraph, network_name
-    # )
+        # the final graph is kept in memory between batches; the GraphML file is
+        # only read back on the first batch after a restart
+        persisted_graph = globals.final_graphs.get(network_name)
+        if persisted_graph is None:
+            try:
+                persisted_graph = load_graph(
+                    f"src/g/graphs_two/final_{network_name}_graph.graphml"
+                    # f"src/graph/graphs_two/final_graph17.graphml"
+                )
 
-    for node, data in final_graph.nodes(data=True):
-        for key, value in list(data.items()):
-            if isinstance(value, type):
-                data[key] = str(value)
-            elif isinstance(value, list):
-                data[key] = json.dumps(value)
-
-    for u, v, data in final_graph.edges(data=True):
-        for key, value in list(data.items()):
-            if isinstance(value, type):
-                data[key] = str(value)
-            elif isinstance(value, list):
-                data[key] = json.dumps(value)
-
-    findings = await generate_alerts(
-        analyzed_subgraph, persisted_graph, network_name, previous_community_ids
-    )
+            except Exception as e:
+                persisted_graph = nx.Graph()
 
-    save_graph(
-        final_graph,
-        # f"src/graph/graphs_two/final_graph17.graphml"
-        f"src/g/graphs_two/final_{network_name}_graph.graphml",
-    )
-    # save_graph(
-    #     final_graph,
-    #     f"/Users/andrewworth/Library/Application Support/Neo4j Desktop/Application/relate-data/dbmss/dbms-3022a2a9-de9d-4f32-858b-29e182c70fc0/import/final_{network_name}_graph.graphml",
-    # )
+        # driver = get_neo4j_driver()
+        # if driver is None:
+        #     print("Failed to get Neo4j driver")
+        #     return
 
-    # neo4j_import_path = "/Users/andrewworth/Library/Application Support/Neo4j Desktop/Application/relate-data/dbmss/dbms-3022a2a9-de9d-4f32-858b-29e182c70fc0/import"
-    graphml_filename = f"final_{network_name}_graph.graphml"
-    # graphml_path = os.path.join(neo4j_import_path, graphml_filename)
+        final_graph, previous_community_ids = merge_final_graphs(
+            analyzed_subgraph, persisted_graph
+        )
 
-    # await load_graphml_into_neo4j(driver, network_name)
-    # await parse_and_load_graphml_into_neo4j(driver, network_name)
-    print("loaded graph into neo4j")
+        # final_graph, previous_community_ids = merge_final_graphs_neo4j(
+        #     driver, analyzed_subgraph, network_name
+        # )
 
-    print("COMPLETE")
-    return findings
+        # persist the final graph from a worker thread so the GraphML write
+        # doesn't block the event loop; the in-memory copy is reused next batch
+        save_graph_future = asyncio.get_running_loop().run_in_executor(
+            None,
+            save_graph,
+            final_graph,
+            # f"src/graph/graphs_two/final_graph17.graphml"
+            f"src/g/graphs_two/final_{network_name}_graph.graphml",
+        )
+        globals.final_graphs[network_name] = final_graph
+
+        try:
+            transfer_count, contract_transaction_count = await mark_processed_task
+            globals.all_transfers += transfer_count
+            print("Number of transfers:", globals.all_transfers)
+            globals.all_contract_transactions += contract_transaction_count
+            print("Number of contract transactions:", globals.all_contract_transactions)
+
+            findings = await generate_alerts(
+                analyzed_subgraph,
+                persisted_graph,
+                network_name,
+                previous_community_ids,
+            )
+        finally:
+            # the next batch mutates final_graph in merge_final_graphs, so the
+            # write must be finished before this returns, even on an error
+            await save_graph_future
+        # save_graph(
+        #     final_graph,
+        #     f"/Users/andrewworth/Library/Application Support/Neo4j Desktop/Application/relate-data/dbmss/dbms-3022a2a9-de9d-4f32-858b-29e182c70fc0/import/final_{network_name}_graph.graphml",
+        # )
+
+        # neo4j_import_path = "/Users/andrewworth/Library/Application Support/Neo4j Desktop/Application/relate-data/dbmss/dbms-3022a2a9-de9d-4f32-858b-29e182c70fc0/import"
+        graphml_filename = f"final_{network_name}_graph.graphml"
+        # graphml_path = os.path.join(neo4j_import_path, graphml_filename)
+
+        # await load_graphml_into_neo4j(driver, network_name)
+        # await parse_and_load_graphml_into_neo4j(driver, network_name)
+        print("loaded graph into neo4j")
+
+        print("COMPLETE")
+        return findings
+    finally:
+        # the caller rolls back and closes the session on an error, so the
+        # UPDATE must not still be running on it when this returns
+        await asyncio.wait([mark_processed_task])
 
     # create_graph_query = f"""
     #     CALL gds.graph.project(
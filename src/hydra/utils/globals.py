@@ -1,4 +1,5 @@
 import networkx as nx
+import os
 
 transaction_counter = 0
 database_initialized = False
@@ -9,6 +10,10 @@ is_initial_batch = True
 # global_added_edges = []
 previous_communities = {}
 is_graph_initialized = False
+final_graphs = {}
+
+# set DEBUG_DUMP_GRAPHS to write intermediate batch graphs to src/g/graphs
+DEBUG_DUMP_GRAPHS = bool(os.environ.get("DEBUG_DUMP_GRAPHS"))
 
 all_transfers = 0
 all_contract_transactions = 0
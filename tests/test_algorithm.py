@@ -0,0 +1,72 @@
+import asyncio
+import random
+
+import networkx as nx
+
+from src.constants import L_THRESHOLD
+from src.hydra.analysis.transaction_analysis.algorithm import (
+    run_algorithm,
+    run_algorithm_in_parallel,
+)
+
+
+def community_groups(communities):
+    groups = {}
+    for node, community in communities.items():
+        groups.setdefault(community, set()).add(node)
+    return {frozenset(group) for group in groups.values()}
+
+
+def add_clique_chain(graph, prefix, node_count):
+    # 4-node cliques joined by near-zero weight links, so Louvain has one
+    # obvious answer no matter how it orders the vertices
+    cliques = [
+        [f"{prefix}_{i}_{j}" for j in range(4)] for i in range(node_count // 4 + 1)
+    ]
+    for clique in cliques:
+        graph.add_weighted_edges_from(
+            (u, v, 1.0) for u in clique for v in clique if u != v
+        )
+    for clique, next_clique in zip(cliques, cliques[1:]):
+        graph.add_edge(clique[0], next_clique[0], weight=1e-6)
+    return cliques
+
+
+def add_random_component(graph, prefix, rng):
+    size = rng.randint(12, 40)
+    nodes = [f"{prefix}_{i}" for i in range(size)]
+    # a path keeps the component connected, random edges add SCCs inside it
+    graph.add_weighted_edges_from(
+        (u, v, rng.random()) for u, v in zip(nodes, nodes[1:])
+    )
+    for _ in range(size):
+        u, v = rng.sample(nodes, 2)
+        graph.add_edge(u, v, weight=rng.random())
+
+
+def test_parallel_partitioning_matches_run_algorithm():
+    rng = random.Random(0)
+    graph = nx.DiGraph()
+    cliques = add_clique_chain(graph, "a", L_THRESHOLD) + add_clique_chain(
+        graph, "b", L_THRESHOLD
+    )
+    for i in range(200):
+        add_random_component(graph, f"small{i}", rng)
+
+    communities = asyncio.run(run_algorithm_in_parallel(graph))
+
+    assert community_groups(communities) == community_groups(run_algorithm(graph))
+    assert {frozenset(clique) for clique in cliques} <= community_groups(communities)
+    assert len(communities) == graph.number_of_nodes()
+
+
+def test_small_components_are_partitioned_like_run_algorithm():
+    for seed in range(40):
+        rng = random.Random(seed)
+        graph = nx.DiGraph()
+        for i in range(rng.randint(1, 30)):
+            add_random_component(graph, f"c{i}", rng)
+
+        communities = asyncio.run(run_algorithm_in_parallel(graph))
+
+        assert community_groups(communities) == community_groups(run_algorithm(graph))
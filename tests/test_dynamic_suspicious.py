@@ -0,0 +1,30 @@
+import networkx as nx
+
+from src.hydra.dynamic.dynamic_suspicious import merge_final_graphs
+
+
+def add_cluster(graph, nodes, community):
+    graph.add_nodes_from(nodes, community=community, status="suspicious")
+    graph.add_edges_from(zip(nodes, nodes[1:]))
+
+
+def test_swapped_community_ids_are_not_merged():
+    persistent_graph = nx.Graph()
+    add_cluster(persistent_graph, [f"a{i}" for i in range(15)], 1)
+    add_cluster(persistent_graph, [f"b{i}" for i in range(15)], 2)
+
+    # the batch numbers the same two clusters the other way round, so each
+    # remap targets an id the other batch community still has to move from
+    batch_a = [f"a{i}" for i in range(10, 25)]
+    batch_b = [f"b{i}" for i in range(10, 25)]
+    G_analyzed = nx.DiGraph()
+    add_cluster(G_analyzed, batch_a, 2)
+    add_cluster(G_analyzed, batch_b, 1)
+
+    final_graph, previous_community_ids = merge_final_graphs(
+        G_analyzed, persistent_graph
+    )
+
+    assert previous_community_ids == {1, 2}
+    assert {final_graph.nodes[n]["community"] for n in batch_a} == {1}
+    assert {final_graph.nodes[n]["community"] for n in batch_b} == {2}
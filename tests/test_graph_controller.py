@@ -0,0 +1,131 @@
+import random
+from collections import defaultdict
+
+import networkx as nx
+import pytest
+
+from src.hydra.graph_controllers.graph_controller import (
+    adjust_edge_weights_and_variances,
+)
+
+
+def reference_edge_weights(added_edges, subgraph):
+    # the original per-edge loop over the target's out-edges
+    edge_weights = defaultdict(int)
+    for edge in added_edges:
+        edge_weights[edge] += 1
+
+    weights = {}
+    for node in subgraph.nodes():
+        for _, target, data in subgraph.edges(node, data=True):
+            if (node, target) in weights or (target, node) in weights:
+                continue
+            variances = [
+                abs(data["gas_price"] - adj["gas_price"])
+                + abs(data["amount"] - adj["amount"])
+                + abs(data["timestamp"] - adj["timestamp"])
+                for _, _, adj in subgraph.edges(target, data=True)
+            ]
+            mean_variance = sum(variances) / len(variances) if variances else 0
+            weights[(node, target)] = (1 / (mean_variance + 1)) * edge_weights[
+                (node, target)
+            ]
+    return weights
+
+
+def add_transfer(subgraph, added_edges, sender, receiver, amount, gas_price, timestamp):
+    subgraph.add_edge(
+        sender,
+        receiver,
+        amount=float(amount),
+        gas_price=float(gas_price),
+        timestamp=timestamp,
+    )
+    added_edges.append((sender, receiver))
+
+
+def wei_scale_batch(seed):
+    rng = random.Random(seed)
+    subgraph = nx.DiGraph()
+    added_edges = []
+
+    # an exchange hot wallet paying out large, varied amounts
+    for i in range(2000):
+        add_transfer(
+            subgraph,
+            added_edges,
+            "hub",
+            f"customer{i}",
+            rng.randint(10**18, 10**21),
+            rng.randint(10**9, 10**11),
+            1700000000 + rng.randint(0, 3600),
+        )
+        add_transfer(
+            subgraph,
+            added_edges,
+            f"customer{i}",
+            "hub",
+            rng.randint(10**18, 10**21),
+            rng.randint(10**9, 10**11),
+            1700000000 + rng.randint(0, 3600),
+        )
+
+    # a funder fanning identical amounts out to wallets that forward identical
+    # amounts to one collector, which bridges the same amount out
+    for i in range(15):
+        add_transfer(
+            subgraph,
+            added_edges,
+            "funder",
+            f"sybil{i}",
+            5 * 10**17,
+            2 * 10**10,
+            1700000000,
+        )
+        add_transfer(
+            subgraph,
+            added_edges,
+            f"sybil{i}",
+            "collector",
+            5 * 10**17,
+            2 * 10**10,
+            1700000000,
+        )
+
+    add_transfer(
+        subgraph, added_edges, "collector", "bridge", 5 * 10**17, 2 * 10**10, 1700000000
+    )
+
+    # random traffic between a few hundred ordinary wallets
+    for _ in range(3000):
+        add_transfer(
+            subgraph,
+            added_edges,
+            f"wallet{rng.randint(0, 300)}",
+            f"wallet{rng.randint(0, 300)}",
+            rng.randint(0, 10**19),
+            rng.randint(10**9, 10**11),
+            1700000000 + rng.randint(0, 3600),
+        )
+    return subgraph, added_edges
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_edge_weights_match_reference_loop(seed):
+    subgraph, added_edges = wei_scale_batch(seed)
+    expected = reference_edge_weights(added_edges, subgraph)
+
+    adjust_edge_weights_and_variances(added_edges, subgraph)
+
+    for (u, v), weight in expected.items():
+        assert subgraph[u][v]["weight"] >= 0
+        assert subgraph[u][v]["weight"] == pytest.approx(weight, rel=1e-9)
+
+
+def test_identical_transfers_get_identical_weights():
+    subgraph, added_edges = wei_scale_batch(0)
+
+    adjust_edge_weights_and_variances(added_edges, subgraph)
+
+    assert {subgraph["funder"][f"sybil{i}"]["weight"] for i in range(15)} == {1.0}
+    assert {subgraph[f"sybil{i}"]["collector"]["weight"] for i in range(15)} == {1.0}